@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+import queue
 import subprocess
+import threading
 from pathlib import Path
 import os
+import stat
+import sqlite3
+import mmap
 import hashlib
 import shutil
 import sys
-from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
-from PIL import Image
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
+from dataclasses import dataclass, field
+from PIL import Image, UnidentifiedImageError
 import logging
 
 # 設置日誌
@@ -22,21 +29,137 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Prefer the OpenSSL SHA-256 backend; on SHA-NI capable CPUs its runtime
+# dispatch uses the hardware SHA extensions, which hash several times faster
+# than the generic code
+try:
+    import _hashlib
+    _sha256 = _hashlib.openssl_sha256
+except (ImportError, AttributeError):
+    _sha256 = hashlib.sha256
+
+def log_sha256_backend():
+    """Log the SHA-256 backend in use and warn when SHA-NI is unavailable."""
+    try:
+        import ssl
+        logger.debug(f"SHA-256 backend: OpenSSL {ssl.OPENSSL_VERSION}")
+    except ImportError:
+        logger.debug("ssl module unavailable; hashlib is using its built-in SHA-256")
+    try:
+        with open('/proc/cpuinfo') as cpuinfo:
+            if 'sha_ni' not in cpuinfo.read():
+                logger.info("CPU has no SHA-NI extensions; SHA-256 hashing will use slower code paths.")
+    except OSError:
+        # Non-Linux platforms have no /proc/cpuinfo; skip the check
+        pass
+
+# Extensions the scanner accepts (lowercase, with the dot)
+_RAW_EXTS = frozenset({'.arw'})
+_PIL_EXTS = frozenset({'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.gif', '.bmp'})
+_SUPPORTED_EXTS = _RAW_EXTS | _PIL_EXTS
+# Formats that actually carry an EXIF container worth querying ExifTool for
+_EXIF_CAPABLE_EXTS = frozenset({'.jpg', '.jpeg', '.tiff', '.tif', '.arw'})
+# Pillow format names by extension, so Image.open can skip plugin probing
+_PIL_FORMAT_MAP = {
+    '.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG',
+    '.tiff': 'TIFF', '.tif': 'TIFF', '.gif': 'GIF', '.bmp': 'BMP',
+}
+
+def make_identifier(camera_model: Optional[str], img_hash: Optional[str], resolution: Optional[Tuple[int, int]], file_size: int) -> Tuple:
+    """Build the tuple that identifies an image for duplicate detection."""
+    return (camera_model or "", img_hash or "", resolution or (0, 0), file_size)
+
+@dataclass(frozen=True, slots=True)
 class ImageMetadata:
-    """Image metadata used for comparison."""
+    """Image metadata used for comparison. Immutable; built once hashing is final."""
     path: Path
     file_size: int
     hash: Optional[str] = None
     camera_model: Optional[str] = None
     resolution: Optional[Tuple[int, int]] = None
-    
+    identifier: Tuple = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(
+            self, 'identifier',
+            make_identifier(self.camera_model, self.hash, self.resolution, self.file_size)
+        )
+
     def get_identifier(self) -> Tuple:
-        """Get a tuple that can identify this image for duplicate detection."""
-        return (self.camera_model or "", self.hash or "", self.resolution or (0, 0), self.file_size)
+        """Get the precomputed tuple identifying this image for duplicate detection."""
+        return self.identifier
 
+# Row produced by process_single_image: (path, mtime, file_size, hash, camera_model, resolution)
+ImageRow = Tuple[Path, float, int, Optional[str], Optional[str], Optional[Tuple[int, int]]]
+
+# Default location of the persistent metadata cache
+_CACHE_DB_PATH = Path.home() / '.cache' / 'duplicate_photo_finder' / 'hashes.db'
+
+class MetadataCache:
+    """Persistent per-file metadata cache keyed by absolute path, validated by mtime+size.
+
+    Re-running the tool over the same directory skips the quick signature,
+    ExifTool queries and full-content hashing for files that have not changed
+    since the previous run, leaving little more than the directory walk.
+    Paths are normalized to absolute form on both lookup and store, so scans
+    of different directories through identical relative paths cannot collide
+    and the same directory hits the cache from any working directory. Each
+    row records whether ExifTool was available when it was written, and is
+    only served to runs with matching availability.
+    """
+
+    def __init__(self, db_path: Path = _CACHE_DB_PATH):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path))
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS image_metadata ('
+            'path TEXT PRIMARY KEY, mtime REAL, size INTEGER, '
+            'quick_hash TEXT, sha256 TEXT, model TEXT, w INTEGER, h INTEGER, '
+            'exif INTEGER)'
+        )
+        try:
+            self._conn.execute('ALTER TABLE image_metadata ADD COLUMN exif INTEGER')
+        except sqlite3.OperationalError:
+            pass  # the column already exists (any database created since it was added)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_size_sha256 ON image_metadata (size, sha256)')
+        self._conn.commit()
+
+    def lookup(self, image_path: Path, file_stat: os.stat_result, exiftool_available: bool) -> Optional[Tuple[Optional[str], Optional[str], Optional[str], Optional[Tuple[int, int]]]]:
+        """Return (quick_hash, sha256, model, resolution) when the entry is still fresh.
+
+        Model and resolution are part of the duplicate identifier, so a row
+        written without ExifTool (model always NULL) must not be served once
+        ExifTool is available — and vice versa — or identical files processed
+        under different availability would land in different groups.
+        """
+        row = self._conn.execute(
+            'SELECT mtime, size, quick_hash, sha256, model, w, h, exif FROM image_metadata WHERE path = ?',
+            (os.path.abspath(image_path),)
+        ).fetchone()
+        if row is None or row[0] != file_stat.st_mtime or row[1] != file_stat.st_size:
+            return None
+        _, _, quick_hash, sha256, model, w, h, exif = row
+        if bool(exif) != exiftool_available:
+            return None
+        resolution = (w, h) if w is not None and h is not None else None
+        return quick_hash, sha256, sys.intern(model) if model is not None else None, resolution
+
+    def store(self, rows: List[Tuple]) -> None:
+        """Batch-upsert (path, mtime, size, quick_hash, sha256, model, w, h, exif) rows."""
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO image_metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(os.path.abspath(row[0]),) + tuple(row[1:]) for row in rows]
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+@lru_cache(maxsize=1)
 def check_exiftool_exists() -> bool:
-    """Check if ExifTool is installed and available."""
+    """Check if ExifTool is installed and available. Cached after the first probe."""
     try:
         result = subprocess.run(
             ['exiftool', '-ver'],
@@ -50,138 +173,303 @@ def check_exiftool_exists() -> bool:
         logger.warning(f"ExifTool not found or error: {str(e)}")
         return False
 
-def get_camera_model_single(image_path: Path) -> Tuple[Path, Optional[str]]:
-    """Process a single file with ExifTool to extract camera model."""
-    try:
-        result = subprocess.run(
-            ['exiftool', '-Model', '-s3', str(image_path)],
-            capture_output=True,
-            text=True,
-            timeout=30
+class ExifToolDaemon:
+    """Persistent ExifTool process using -stay_open batch mode.
+
+    Spawning one exiftool process per file costs a perl interpreter startup
+    for every query; a single stay_open daemon answers all queries over its
+    stdin/stdout pipe instead. Queries are serialized with a lock so the
+    daemon can be shared between worker threads.
+    """
+
+    def __init__(self):
+        self._process = subprocess.Popen(
+            ['exiftool', '-stay_open', 'True', '-@', '-', '-common_args', '-s2'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
         )
-        if result.returncode == 0 and result.stdout.strip():
-            return image_path, result.stdout.strip()
-        return image_path, None
-    except Exception as e:
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    def query(self, image_path: Path, tags: List[str]) -> Dict[str, str]:
+        """Query the daemon for the given tags and return a tag -> value dict."""
+        with self._lock:
+            self._sequence += 1
+            sentinel = f"{{ready{self._sequence}}}"
+            self._process.stdin.write(
+                ''.join(f"{tag}\n" for tag in tags) + f"{str(image_path)}\n-execute{self._sequence}\n"
+            )
+            self._process.stdin.flush()
+
+            results: Dict[str, str] = {}
+            for line in self._process.stdout:
+                line = line.rstrip('\n')
+                if line == sentinel:
+                    break
+                # -s2 output format is "TagName: value"
+                tag_name, sep, value = line.partition(': ')
+                if sep and value:
+                    results[tag_name] = value
+            return results
+
+    def close(self):
+        """Shut down the daemon process."""
+        try:
+            self._process.stdin.write('-stay_open\nFalse\n')
+            self._process.stdin.flush()
+            self._process.wait(timeout=5)
+        except Exception as e:
+            logger.warning(f"Error shutting down ExifTool daemon: {str(e)}")
+            self._process.kill()
+
+def get_exiftool_metadata(image_path: Path, daemon: ExifToolDaemon) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+    """Get camera model and resolution from ExifTool in a single round-trip."""
+    try:
+        tags = daemon.query(image_path, ['-Model', '-ImageWidth', '-ImageHeight'])
+    except (OSError, ValueError) as e:
+        logger.error(f"Error querying ExifTool daemon for {image_path}: {str(e)}")
+        return None, None
+
+    # Intern the model so the group-by compares pointers for the common case
+    # of thousands of photos from one camera
+    camera_model = sys.intern(tags['Model']) if 'Model' in tags else None
+    resolution = None
+    try:
+        resolution = (int(tags['ImageWidth']), int(tags['ImageHeight']))
+    except KeyError:
+        pass
+    except ValueError:
+        logger.error(f"Invalid resolution from ExifTool for {image_path}: {tags}")
+    return camera_model, resolution
+
+def get_camera_model_single(image_path: Path, daemon: ExifToolDaemon) -> Tuple[Path, Optional[str]]:
+    """Extract the camera model of a single file via the ExifTool daemon."""
+    try:
+        tags = daemon.query(image_path, ['-Model'])
+        return image_path, tags.get('Model')
+    except (OSError, ValueError) as e:
         logger.error(f"Error extracting camera model from {image_path}: {str(e)}")
         return image_path, None
 
-def get_image_resolution_exiftool(image_path: Path) -> Optional[Tuple[int, int]]:
-    """Get the resolution of an image using ExifTool."""
+def get_image_resolution_exiftool(image_path: Path, daemon: ExifToolDaemon) -> Optional[Tuple[int, int]]:
+    """Get the resolution of an image via the ExifTool daemon."""
     try:
-        result = subprocess.run(
-            ['exiftool', '-ImageWidth', '-ImageHeight', '-s3', '-sep', 'x', str(image_path)],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        if result.returncode == 0 and result.stdout.strip():
-            # ExifTool output format should be "WidthxHeight"
-            dimensions = result.stdout.strip()
-            # Try to parse dimensions in format "WidthxHeight"
-            if 'x' in dimensions:
-                width, height = dimensions.split('x')
-                try:
-                    return (int(width), int(height))
-                except ValueError:
-                    logger.error(f"Invalid resolution format from ExifTool: {dimensions}")
-                    return None
-            # Try parsing dimensions in separate lines format
-            elif '\n' in dimensions:
-                width, height = dimensions.split('\n')
-                try:
-                    return (int(width), int(height))
-                except ValueError:
-                    logger.error(f"Invalid resolution format from ExifTool: {dimensions}")
-                    return None
-        return None
-    except Exception as e:
+        tags = daemon.query(image_path, ['-ImageWidth', '-ImageHeight'])
+        try:
+            return (int(tags['ImageWidth']), int(tags['ImageHeight']))
+        except KeyError:
+            return None
+        except ValueError:
+            logger.error(f"Invalid resolution format from ExifTool: {tags}")
+            return None
+    except (OSError, ValueError) as e:
         logger.error(f"Error getting resolution with ExifTool for {image_path}: {str(e)}")
         return None
 
-def get_image_resolution(image_path: Path, exiftool_available: bool, force_exiftool: bool = False) -> Optional[Tuple[int, int]]:
-    """Get the resolution of an image, using ExifTool for RAW files or when forced."""
+def get_image_resolution(image_path: Path, daemon: Optional[ExifToolDaemon], force_exiftool: bool = False, img_file=None) -> Optional[Tuple[int, int]]:
+    """Get the resolution of an image, using ExifTool for RAW files or when forced.
+
+    When the caller already holds an open handle it can pass it as img_file
+    to spare PIL a second open of the same file.
+    """
     file_ext = image_path.suffix.lower()
-    
+
     # If force_exiftool is enabled, always use ExifTool when available
-    if force_exiftool and exiftool_available:
-        return get_image_resolution_exiftool(image_path)
-    
+    if force_exiftool and daemon is not None:
+        return get_image_resolution_exiftool(image_path, daemon)
+
     # For RAW files, use ExifTool if available
-    if file_ext == '.arw' and exiftool_available:
-        return get_image_resolution_exiftool(image_path)
-    
+    if file_ext in _RAW_EXTS and daemon is not None:
+        return get_image_resolution_exiftool(image_path, daemon)
+
     # For standard image formats, try PIL first (unless force_exiftool is enabled)
-    if file_ext in {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.gif', '.bmp'}:
+    if file_ext in _PIL_EXTS:
         try:
-            with Image.open(image_path) as img:
-                return img.size
-        except Exception as e:
+            # Image.open only parses the header; naming the format skips the
+            # plugin probing loop, and reading .size directly avoids the
+            # context manager's full teardown path
+            pil_format = _PIL_FORMAT_MAP.get(file_ext)
+            if img_file is not None:
+                img_file.seek(0)
+                img = Image.open(img_file, formats=[pil_format] if pil_format else None)
+            else:
+                img = Image.open(image_path, formats=[pil_format] if pil_format else None)
+            size = img.size
+            img.close()
+            return size
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+            # The bomb guard trips on legitimate gigapixel panoramas, and it
+            # raises a bare Exception subclass rather than an OSError
             logger.error(f"Error getting resolution with PIL for {image_path}: {str(e)}")
-            
+
             # Fall back to ExifTool if PIL fails and ExifTool is available
-            if exiftool_available:
+            if daemon is not None:
                 logger.info(f"Trying ExifTool for resolution of {image_path}")
-                return get_image_resolution_exiftool(image_path)
-            
+                return get_image_resolution_exiftool(image_path, daemon)
+
     return None
 
+# Sentinel marking the end of the parallel walk
+_WALK_DONE = object()
+
+def iter_image_files(directory: str, max_workers: int = 8):
+    """Recursively scan a directory in parallel, yielding (path, stat) per image file.
+
+    Each discovered subdirectory becomes its own os.scandir task in a small
+    thread pool, so the per-directory round-trip latency of network
+    filesystems is overlapped instead of serialized; files stream out through
+    a queue as they are found, letting callers start work before the walk
+    finishes. os.scandir also caches the stat result from the directory read,
+    so the walk costs one syscall per entry instead of the three paid by
+    rglob plus the later per-file stat and access checks.
+    """
+    results: queue.Queue = queue.Queue()
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    pending_dirs = 0
+    pending_lock = threading.Lock()
+
+    def submit_dir(path):
+        nonlocal pending_dirs
+        with pending_lock:
+            pending_dirs += 1
+        pool.submit(scan_dir, path)
+
+    def scan_dir(current):
+        nonlocal pending_dirs
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            submit_dir(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            ext = entry.name[entry.name.rfind('.'):].lower()
+                            if ext in _SUPPORTED_EXTS:
+                                results.put((Path(entry.path), entry.stat(follow_symlinks=False)))
+                    except OSError as e:
+                        logger.error(f"Error reading entry {entry.path}: {str(e)}")
+        except OSError as e:
+            logger.error(f"Error scanning directory {current}: {str(e)}")
+        finally:
+            with pending_lock:
+                pending_dirs -= 1
+                if pending_dirs == 0:
+                    results.put(_WALK_DONE)
+
+    submit_dir(directory)
+    try:
+        while True:
+            item = results.get()
+            if item is _WALK_DONE:
+                break
+            yield item
+    finally:
+        pool.shutdown(wait=False)
+
+# Head/tail window hashed by quick_signature
+_QUICK_READ_SIZE = 64 * 1024
+
+def quick_signature(img_file, size: int) -> str:
+    """Hash the first and last 64 KiB of an already-open file via os.pread.
+
+    Files with a unique (size, quick hash) signature cannot be duplicates, so
+    only files sharing one need a full-content hash. This caps the read cost
+    of the common no-duplicate case at 128 KiB per file. os.pread leaves the
+    file position untouched, so the handle can be reused afterwards.
+    """
+    fd = img_file.fileno()
+    sha256_hash = _sha256()
+    sha256_hash.update(os.pread(fd, _QUICK_READ_SIZE, 0))
+    if size > _QUICK_READ_SIZE:
+        # Read the tail without overlapping the head window
+        sha256_hash.update(os.pread(fd, _QUICK_READ_SIZE, max(_QUICK_READ_SIZE, size - _QUICK_READ_SIZE)))
+    return sha256_hash.hexdigest()
+
 def calculate_image_hash(image_path: Path) -> Tuple[Path, Optional[str]]:
     """Calculate a hash for the image content."""
     try:
-        # For large files, use a buffer to avoid loading the entire file into memory
-        sha256_hash = hashlib.sha256()
-        with open(image_path, 'rb') as img_file:
-            # Read the file in chunks
-            for byte_block in iter(lambda: img_file.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return image_path, sha256_hash.hexdigest()
-    except Exception as e:
+        with open(image_path, 'rb', buffering=0) as img_file:
+            fd = img_file.fileno()
+            # Hint maximal readahead for the sequential scan (no-op off Linux)
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            try:
+                # Map the file and hash it in one C-level call over the pages,
+                # avoiding the kernel-to-userspace copy of a read loop
+                with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped:
+                    digest = _sha256(mapped).hexdigest()
+            except (ValueError, OSError):
+                # Empty files and platforms that refuse the mapping fall back to streaming
+                if hasattr(hashlib, 'file_digest'):
+                    # Python 3.11+: the whole read+hash loop runs in C
+                    digest = hashlib.file_digest(img_file, _sha256).hexdigest()
+                else:
+                    # Read in large chunks to avoid loading the entire file into memory
+                    sha256_hash = _sha256()
+                    for byte_block in iter(lambda: img_file.read(1 << 20), b""):
+                        sha256_hash.update(byte_block)
+                    digest = sha256_hash.hexdigest()
+            # Drop the streamed pages so bulk scans don't churn the page cache
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        return image_path, digest
+    except OSError as e:
         logger.error(f"Error calculating hash for {image_path}: {str(e)}")
         return image_path, None
 
-def get_file_size(image_path: Path) -> int:
-    """Get the file size in bytes."""
-    try:
-        return image_path.stat().st_size
-    except Exception as e:
-        logger.error(f"Error getting file size for {image_path}: {str(e)}")
-        return 0
+def calculate_image_hashes_bulk(image_paths: List[Path]) -> List[Tuple[Path, Optional[str]]]:
+    """Hash a batch of related files back-to-back in one worker task."""
+    return [calculate_image_hash(image_path) for image_path in image_paths]
 
-def process_single_image(image_path: Path, exiftool_available: bool, force_exiftool: bool = False) -> Optional[ImageMetadata]:
-    """Process a single image to extract all metadata."""
+def process_single_image(image_path: Path, file_stat: os.stat_result, daemon: Optional[ExifToolDaemon], force_exiftool: bool = False) -> Optional[ImageRow]:
+    """Process a single image, returning its metadata as a plain row tuple."""
     try:
-        # Check file permissions
-        if not os.access(image_path, os.R_OK):
+        # Check the permission bit from the cached stat instead of an os.access syscall
+        if not file_stat.st_mode & stat.S_IRUSR:
             logger.warning(f"No read permission for {image_path}")
             return None
-            
-        file_size = get_file_size(image_path)
-        
-        # Extract camera model if ExifTool is available
+
+        file_size = file_stat.st_size
+        img_hash = None
         camera_model = None
-        if exiftool_available:
-            _, camera_model = get_camera_model_single(image_path)
-        
-        # Get image hash
-        _, img_hash = calculate_image_hash(image_path)
-        
-        # Get resolution (force exiftool if requested)
-        resolution = get_image_resolution(image_path, exiftool_available, force_exiftool)
-            
-        return ImageMetadata(
-            path=image_path,
-            file_size=file_size,
-            hash=img_hash,
-            camera_model=camera_model,
-            resolution=resolution
-        )
-    except Exception as e:
+        resolution = None
+
+        # Open the file once and reuse the handle for the quick signature and
+        # the PIL resolution fallback; ExifTool opens by path on its side
+        with open(image_path, 'rb', buffering=0) as img_file:
+            # Cheap pre-hash; files sharing a quick signature get a full hash later
+            try:
+                img_hash = quick_signature(img_file, file_size)
+            except OSError as e:
+                logger.error(f"Error computing quick signature for {image_path}: {str(e)}")
+
+            # Extract camera model and resolution in one daemon round-trip;
+            # formats without an EXIF container never carry a Model tag, so
+            # skip the query for them unless ExifTool is forced
+            if daemon is not None and (force_exiftool or image_path.suffix.lower() in _EXIF_CAPABLE_EXTS):
+                camera_model, resolution = get_exiftool_metadata(image_path, daemon)
+
+            # Fall back to PIL for resolution when ExifTool did not provide one
+            if resolution is None:
+                resolution = get_image_resolution(image_path, daemon, force_exiftool, img_file)
+
+        return image_path, file_stat.st_mtime, file_size, img_hash, camera_model, resolution
+    except OSError as e:
         logger.error(f"Error processing {image_path}: {str(e)}")
         return None
+    except Exception as e:
+        # Last-resort guard: executor.map re-raises the first worker exception
+        # and discards the remaining results, so anything escaping here would
+        # abort the whole scan instead of costing one row
+        logger.error(f"Unexpected error processing {image_path}: {str(e)}")
+        return None
+
+def process_images_parallel(directory: str, max_workers: Optional[int] = None, force_exiftool: bool = False) -> Iterator[Tuple[Tuple, List[ImageMetadata]]]:
+    """Process images in parallel, yielding (identifier, group) per duplicate group."""
+    log_sha256_backend()
 
-def process_images_parallel(directory: str, max_workers: Optional[int] = None, force_exiftool: bool = False) -> Dict[Tuple, List[ImageMetadata]]:
-    """Process images in parallel using ThreadPoolExecutor."""
     # Check if ExifTool is available
     exiftool_available = check_exiftool_exists()
     
@@ -193,46 +481,164 @@ def process_images_parallel(directory: str, max_workers: Optional[int] = None, f
         exiftool_available = True
     elif not exiftool_available:
         logger.warning("ExifTool not found. Metadata extraction will be limited.")
-    
+
     # If max_workers not specified, use a reasonable default
     if max_workers is None:
         max_workers = min(32, (os.cpu_count() or 1) * 4)
-    
-    # Collect all image paths first
-    image_paths = [
-        p for p in Path(directory).rglob("*.*")
-        if p.suffix.lower() in {'.arw', '.jpg', '.jpeg', '.png', '.tiff', '.tif', '.gif', '.bmp'}
+
+    # Start a single ExifTool daemon shared by all workers
+    daemon = None
+    if exiftool_available:
+        try:
+            daemon = ExifToolDaemon()
+        except Exception as e:
+            logger.warning(f"Failed to start ExifTool daemon: {str(e)}")
+
+    # Open the persistent metadata cache; a failure only costs the speedup
+    cache = None
+    try:
+        cache = MetadataCache()
+    except Exception as e:
+        logger.warning(f"Metadata cache unavailable: {str(e)}")
+
+    # Accumulate results as parallel columns instead of per-file objects;
+    # ImageMetadata objects are materialized only for the duplicate groups
+    paths: List[Path] = []
+    mtimes: List[float] = []
+    sizes: List[int] = []
+    hashes: List[Optional[str]] = []
+    full_hashes: List[Optional[str]] = []
+    models: List[Optional[str]] = []
+    resolutions: List[Optional[Tuple[int, int]]] = []
+    dirty: set = set()  # row indices whose cache entry needs (re)writing
+
+    total_files = 0
+
+    # Cached rows may have been produced without ExifTool, so a forced run
+    # must not serve from the cache or it would break the flag's contract
+    use_cache = cache is not None and not force_exiftool
+
+    def uncached_files():
+        # Consume the parallel walk as it streams: unchanged files are
+        # answered from the cache inline and only the rest reach the pool
+        nonlocal total_files, use_cache
+        for path, file_stat in iter_image_files(directory):
+            total_files += 1
+            entry = None
+            if use_cache:
+                try:
+                    entry = cache.lookup(path, file_stat, daemon is not None)
+                except Exception as e:
+                    # A corrupted database must degrade to the uncached path,
+                    # not escape through the map input generator and kill the scan
+                    logger.warning(f"Metadata cache lookup failed, continuing without cache: {str(e)}")
+                    use_cache = False
+            if entry is not None:
+                quick_hash, full_hash, camera_model, resolution = entry
+                paths.append(path)
+                mtimes.append(file_stat.st_mtime)
+                sizes.append(file_stat.st_size)
+                hashes.append(quick_hash)
+                full_hashes.append(full_hash)
+                models.append(camera_model)
+                resolutions.append(resolution)
+            else:
+                yield path, file_stat
+
+    def process_entry(entry: Tuple[Path, os.stat_result]) -> Optional[ImageRow]:
+        return process_single_image(entry[0], entry[1], daemon, force_exiftool)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # executor.map still creates one Future per file (it submits the
+            # whole walk eagerly, so in-flight items are not bounded), but it
+            # drops the futures-to-path dict and the as_completed waiter
+            # machinery; rows come back in submission order
+            for row in executor.map(process_entry, uncached_files()):
+                if row:
+                    path, mtime, file_size, img_hash, camera_model, resolution = row
+                    dirty.add(len(paths))
+                    paths.append(path)
+                    mtimes.append(mtime)
+                    sizes.append(file_size)
+                    hashes.append(img_hash)
+                    full_hashes.append(None)
+                    models.append(camera_model)
+                    resolutions.append(resolution)
+
+            logger.info(f"Found {total_files} image files to process.")
+            if use_cache:
+                logger.info(f"Metadata cache served {total_files - len(dirty)} of {total_files} files.")
+    finally:
+        if daemon is not None:
+            daemon.close()
+
+    # Bucket row indices by quick signature; only files sharing one need the full hash
+    quick_buckets: Dict[Tuple[int, str], List[int]] = defaultdict(list)
+    for idx, (file_size, img_hash) in enumerate(zip(sizes, hashes)):
+        if img_hash is not None:
+            quick_buckets[(file_size, img_hash)].append(idx)
+
+    # Cached full hashes are reused; only the remaining bucket members are hashed
+    rehash_buckets = [
+        [idx for idx in bucket if full_hashes[idx] is None]
+        for bucket in quick_buckets.values() if len(bucket) > 1
     ]
-    
-    logger.info(f"Found {len(image_paths)} image files to process.")
-    
-    # Process all files to gather metadata
-    image_metadata_list: List[ImageMetadata] = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_path = {
-            executor.submit(process_single_image, path, exiftool_available, force_exiftool): path 
-            for path in image_paths
-        }
-        
-        # Collect metadata as it completes
-        for future in as_completed(future_to_path):
-            try:
-                metadata = future.result()
-                if metadata:
-                    image_metadata_list.append(metadata)
-            except Exception as e:
-                logger.error(f"Error processing future: {str(e)}")
-    
-    # Group by identifier
-    duplicates: Dict[Tuple, List[ImageMetadata]] = {}
-    for metadata in image_metadata_list:
-        identifier = metadata.get_identifier()
-        if identifier not in duplicates:
-            duplicates[identifier] = []
-        duplicates[identifier].append(metadata)
-                
-    # Filter to only include duplicates
-    return {k: v for k, v in duplicates.items() if len(v) > 1}
+    rehash_buckets = [bucket for bucket in rehash_buckets if bucket]
+    if rehash_buckets:
+        index_by_path = {paths[idx]: idx for bucket in rehash_buckets for idx in bucket}
+        logger.info(f"Full-hashing {len(index_by_path)} files in {len(rehash_buckets)} quick-signature buckets.")
+        # SHA-256 is CPU-bound under the GIL, so hash in worker processes;
+        # each task hashes a whole bucket to amortize the IPC cost
+        bucket_paths = [[paths[idx] for idx in bucket] for bucket in rehash_buckets]
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            for results in executor.map(calculate_image_hashes_bulk, bucket_paths, chunksize=4):
+                for path, full_hash in results:
+                    idx = index_by_path[path]
+                    full_hashes[idx] = full_hash
+                    dirty.add(idx)
+
+    # Persist everything learned this run in one batch
+    if cache is not None:
+        try:
+            cache.store([
+                (
+                    str(paths[idx]), mtimes[idx], sizes[idx],
+                    hashes[idx], full_hashes[idx], models[idx],
+                    resolutions[idx][0] if resolutions[idx] else None,
+                    resolutions[idx][1] if resolutions[idx] else None,
+                    1 if daemon is not None else 0
+                )
+                for idx in sorted(dirty)
+            ])
+        except Exception as e:
+            logger.warning(f"Error writing metadata cache: {str(e)}")
+        finally:
+            cache.close()
+
+    # Group row indices by identifier; the full hash supersedes the quick one
+    effective_hashes = [
+        full_hashes[idx] if full_hashes[idx] is not None else hashes[idx]
+        for idx in range(len(paths))
+    ]
+    groups: Dict[Tuple, List[int]] = defaultdict(list)
+    for idx in range(len(paths)):
+        groups[make_identifier(models[idx], effective_hashes[idx], resolutions[idx], sizes[idx])].append(idx)
+
+    # Stream duplicate groups one at a time; ImageMetadata is materialized
+    # only for the group being yielded, so no dict of all groups ever exists
+    for identifier, indices in groups.items():
+        if len(indices) > 1:
+            yield identifier, [
+                ImageMetadata(
+                    path=paths[idx],
+                    file_size=sizes[idx],
+                    hash=effective_hashes[idx],
+                    camera_model=models[idx],
+                    resolution=resolutions[idx]
+                )
+                for idx in indices
+            ]
 
 def format_file_size(size_bytes: int) -> str:
     """Format file size in human-readable format."""
@@ -242,34 +648,50 @@ def format_file_size(size_bytes: int) -> str:
         size_bytes /= 1024.0
     return f"{size_bytes:.2f} {unit}"
 
-def suggest_best_file(duplicates: List[ImageMetadata]) -> int:
-    """Suggest the best file to keep based on resolution and file size."""
+def _best_candidate_index(widths, heights, sizes) -> int:
+    """Pick the candidate with the best resolution-weighted score.
+
+    Kept as a plain loop over flat arrays so Numba can JIT-compile it when
+    installed; the scoring matches the original suggest_best_file logic.
+    """
     best_idx = 0
-    max_score = -1
-    
-    for idx, metadata in enumerate(duplicates):
-        # Score is based on resolution first, then file size
-        resolution_score = 0
-        if metadata.resolution:
-            resolution_score = metadata.resolution[0] * metadata.resolution[1]
-        
-        # We normalize the file size score to avoid it dominating the decision
-        size_score = metadata.file_size / 1000000  # Convert to MB
-        
-        # Overall score prioritizes resolution
-        score = resolution_score * 0.9 + size_score * 0.1
-        
+    max_score = -1.0
+    for idx in range(len(sizes)):
+        # Score prioritizes resolution; size is normalized to MB so it breaks ties
+        score = widths[idx] * heights[idx] * 0.9 + (sizes[idx] / 1000000) * 0.1
         if score > max_score:
             max_score = score
             best_idx = idx
-            
     return best_idx
 
-def remove_duplicate_files(duplicates: Dict[Tuple, List[ImageMetadata]], auto_select_best: bool = False, group_by_group: bool = True, dest_dir: Optional[str] = None):
-    """Remove duplicate files after confirmation, or move them to destination directory."""
-    duplicate_count = sum(len(group) - 1 for group in duplicates.values())
-    logger.info(f"Found {len(duplicates)} groups with {duplicate_count} total duplicate files.")
-    
+# JIT-compile the scoring kernel when Numba is available; it is an optional
+# accelerator, not a dependency
+try:
+    import numpy as np
+    from numba import njit
+    _best_candidate_index = njit(cache=True, fastmath=True)(_best_candidate_index)
+except ImportError:
+    np = None
+
+def suggest_best_file(duplicates: List[ImageMetadata]) -> int:
+    """Suggest the best file to keep based on resolution and file size."""
+    widths = [metadata.resolution[0] if metadata.resolution else 0 for metadata in duplicates]
+    heights = [metadata.resolution[1] if metadata.resolution else 0 for metadata in duplicates]
+    sizes = [metadata.file_size for metadata in duplicates]
+    if np is not None:
+        return int(_best_candidate_index(
+            np.asarray(widths, dtype=np.int64),
+            np.asarray(heights, dtype=np.int64),
+            np.asarray(sizes, dtype=np.int64)
+        ))
+    return _best_candidate_index(widths, heights, sizes)
+
+def remove_duplicate_files(duplicate_groups: Iterable[Tuple[Tuple, List[ImageMetadata]]], auto_select_best: bool = False, group_by_group: bool = True, dest_dir: Optional[str] = None):
+    """Remove or move duplicate files group by group as the groups stream in.
+
+    Accepts any iterable of (identifier, group) pairs, so each group can be
+    processed and released without ever holding all of them in memory.
+    """
     # Prepare destination directory if specified
     dest_path = None
     if dest_dir:
@@ -289,10 +711,14 @@ def remove_duplicate_files(duplicates: Dict[Tuple, List[ImageMetadata]], auto_se
             print(f"{action_verb.capitalize()} canceled.")
             return
     
+    total_groups = 0
+    duplicate_count = 0
     total_processed = 0
     total_space_saved = 0
-    
-    for key, dup_metadata in duplicates.items():
+
+    for key, dup_metadata in duplicate_groups:
+        total_groups += 1
+        duplicate_count += len(dup_metadata) - 1
         camera_model, img_hash, resolution, _ = key
         print(f"\nDuplicate images group:")
         print(f"  Camera Model: {camera_model or 'N/A'}")
@@ -372,6 +798,7 @@ def remove_duplicate_files(duplicates: Dict[Tuple, List[ImageMetadata]], auto_se
                 except Exception as e:
                     logger.error(f"Error {action_verb.replace(' to destination directory', 'ing')} {metadata.path}: {str(e)}")
     
+    logger.info(f"Found {total_groups} groups with {duplicate_count} total duplicate files.")
     action_past = "moved to destination directory" if dest_dir else "removed"
     print(f"\nOperation complete. {action_past.capitalize()} {total_processed} files, saving {format_file_size(total_space_saved)}.")
 
@@ -408,19 +835,20 @@ if __name__ == "__main__":
         sys.exit(1)
     
     logger.info(f"Scanning directory: {args.directory}")
-    duplicates = process_images_parallel(args.directory, max_workers=args.max_workers, force_exiftool=args.force_exiftool)
+    duplicate_groups = process_images_parallel(args.directory, max_workers=args.max_workers, force_exiftool=args.force_exiftool)
 
-    for key, dup_metadata in duplicates.items():
-        camera_model, img_hash, resolution, _ = key
-        print(f"\nDuplicate images group:")
-        print(f"  Camera Model: {camera_model or 'N/A'}")
-        print(f"  Hash: {img_hash[:8]}...{img_hash[-8:] if img_hash else 'N/A'}")
-        
-        if args.list_duplicates:
-            for idx, metadata in enumerate(dup_metadata):
-                resolution_str = f"{metadata.resolution[0]}x{metadata.resolution[1]}" if metadata.resolution else "Unknown"
-                print(f"  [{idx+1}] {metadata.path}")
-                print(f"      Size: {format_file_size(metadata.file_size)}, Resolution: {resolution_str}")
-                
     if args.remove_duplicates:
-        remove_duplicate_files(duplicates, auto_select_best=args.auto_select_best, group_by_group=args.group_by_group, dest_dir=args.dest_dir)
+        # The removal loop prints each group as it streams in
+        remove_duplicate_files(duplicate_groups, auto_select_best=args.auto_select_best, group_by_group=args.group_by_group, dest_dir=args.dest_dir)
+    else:
+        for key, dup_metadata in duplicate_groups:
+            camera_model, img_hash, resolution, _ = key
+            print(f"\nDuplicate images group:")
+            print(f"  Camera Model: {camera_model or 'N/A'}")
+            print(f"  Hash: {img_hash[:8]}...{img_hash[-8:] if img_hash else 'N/A'}")
+
+            if args.list_duplicates:
+                for idx, metadata in enumerate(dup_metadata):
+                    resolution_str = f"{metadata.resolution[0]}x{metadata.resolution[1]}" if metadata.resolution else "Unknown"
+                    print(f"  [{idx+1}] {metadata.path}")
+                    print(f"      Size: {format_file_size(metadata.file_size)}, Resolution: {resolution_str}")